@@ -6,7 +6,7 @@ import traceback
 import uuid
 from werkzeug.utils import secure_filename
 from report_generator import generate_report
-from pdf_creator import create_typed_pdf, create_handwritten_pdf
+from pdf_creator import create_typed_pdf, create_handwritten_pdf, prerender_paper_textures, HANDWRITING_FONT_PATH
 from io import BytesIO
 import threading
 import time
@@ -109,10 +109,6 @@ def create_pdf(report_id):
         else:
             pdf_content = create_handwritten_pdf(topic, content)
         
-        # Create a BytesIO object from the PDF content
-        pdf_buffer = BytesIO(pdf_content)
-        pdf_buffer.seek(0)
-        
         # Generate a safe filename
         safe_filename = secure_filename(f"{topic.replace(' ', '_')}_report.pdf")
         
@@ -194,7 +190,7 @@ if __name__ == '__main__':
     os.makedirs('static/fonts', exist_ok=True)
     
     # Download font if it doesn't exist
-    font_path = os.path.join('static', 'fonts', 'hc.ttf')
+    font_path = HANDWRITING_FONT_PATH
     if not os.path.exists(font_path):
         try:
             import requests
@@ -209,4 +205,8 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"Could not download font: {e}")
     
+    # Opt-in: render every paper texture before serving instead of on first use
+    if os.getenv("PRERENDER_PAPER_TEXTURES") == "1":
+        prerender_paper_textures()
+    
     app.run(debug=True)